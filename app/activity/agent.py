@@ -1,18 +1,22 @@
+from functools import cache, lru_cache
 from typing import Annotated, Literal
 
-from langchain_core.callbacks.manager import (
-    adispatch_custom_event,
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.messages import (
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+    trim_messages,
 )
-from langchain_core.messages import BaseMessage, ToolMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import Runnable, RunnableConfig
 from langchain_core.tools import tool
 from langchain_core.tools.base import InjectedToolCallId
-from langchain_openai import ChatOpenAI
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from langgraph.config import get_stream_writer
 from langgraph.graph import END, StateGraph, add_messages
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import InjectedState, ToolNode, tools_condition
 from langgraph.types import Command
 from pydantic import BaseModel, Field
 from pydantic_ai import format_as_xml
@@ -23,7 +27,9 @@ from app.activity.create_from_onboarding import (
     ActivityStep,
     OnboardingDataComplete,
 )
+from app.activity.llm import clears_with_http_client, get_chat_llm
 from app.activity.models import ActivityLevel
+from app.config import settings
 from app.onboarding.agent import PersonalContext
 
 Messages = Annotated[list[BaseMessage], add_messages]
@@ -41,13 +47,7 @@ class Configuration(BaseModel):
         cls, config: RunnableConfig | None = None
     ) -> "Configuration":
         """Create a Configuration instance from a RunnableConfig."""
-        configurable = (
-            config["configurable"] if config and "configurable" in config else {}
-        )
-
-        values = {key: values for key, values in configurable.items() if key}
-
-        return cls(**values)
+        return cls.model_validate(config.get("configurable", {}) if config else {})
 
 
 class ActivityStepProgress(BaseModel):
@@ -75,153 +75,152 @@ class ActivityProgress(BaseModel):
 
 def get_activity_progress(
     left_progress: ActivityProgress | None = None,
-    rigth_progress: ActivityProgress | None = None,
+    right_progress: ActivityProgress | None = None,
 ) -> ActivityProgress | None:
-    match left_progress, rigth_progress:
-        case None, None:
-            return None
-        case None, rigth_progress:
-            return rigth_progress
-        case left_progress, None:
-            return left_progress
-        case left_progress, rigth_progress:
-            return rigth_progress
+    return right_progress if right_progress is not None else left_progress
+
+
+# Built once at import. Model defaults would otherwise be deep-copied every time
+# LangGraph builds the state; both models are frozen, so sharing them is safe.
+default_onboarding_data = OnboardingDataComplete(
+    life_stage="Professional",
+    profession="Software Engineer",
+    age_range="30-39",
+    personal_context=PersonalContext(
+        hobbies=["reading", "cycling"],
+        family_status="Single",
+    ),
+    financial_goals=["Save for a house", "Build an emergency fund"],
+    financial_interests=["Investing", "Budgeting"],
+    financial_concerns=["Managing debt", "Saving enough"],
+    financial_knowledge_level="Intermediate",
+    previous_experience=[
+        "Has invested in stocks",
+        "Attended a finance workshop",
+    ],
+)
+
+default_activity = Activity(
+    title="Rapid Emergency Fund Blueprint for the Solo Engineer",
+    description=(
+        "Build a resilient emergency fund tailored to your single‑income, "
+        "tech‑professional lifestyle so unexpected costs never derail your "
+        "house‑saving plans."
+    ),
+    overall_objective=(
+        "Have a fully funded, 6‑month emergency fund housed in the right account "
+        "and an automated system to keep it on track."
+    ),
+    background=ActivityBackground(
+        concepts=[
+            "emergency fund",
+            "living expenses",
+            "liquidity",
+            "opportunity cost",
+        ],
+        content=(
+            "An emergency fund is a cash buffer (usually 3–6 months of essential "
+            "living expenses) you can tap when life throws surprises—job loss, "
+            "medical bills, bike repairs. Liquidity means how quickly you can "
+            "access money without losing value; emergency funds need high liquidity "
+            "(think high‑yield savings accounts). While cash earns less than "
+            "investments (opportunity cost), it shields you from selling stocks at "
+            "a loss. As a single software engineer, you rely solely on your income, "
+            "so a 6‑month cushion minimizes risk and protects your bigger goal: "
+            "buying a house."
+        ),
+    ),
+    steps=[
+        ActivityStep(
+            index=1,
+            title="Tally Your Core Living Expenses",
+            content=(
+                "Export the last 3 months of transactions from your bank or budgeting "
+                "app. Write or code a quick script to categorize rent, food, utilities, "
+                "insurance, transport, and minimum debt payments. Average each category "
+                "to get one month of core costs."
+            ),
+            step_objective="Establish an accurate monthly baseline for essential expenses.",
+        ),
+        ActivityStep(
+            index=2,
+            title="Set Your Fund Size Target",
+            content=(
+                "Multiply the monthly core cost by 6 (or 4 if you feel your job is "
+                "ultra‑stable, 9 if you want extra security). Note the final dollar "
+                "amount; this is your emergency‑fund ‘definition of done’."
+            ),
+            step_objective="Define a specific, measurable emergency‑fund goal.",
+        ),
+        ActivityStep(
+            index=3,
+            title="Pick a Parking Spot",
+            content=(
+                "Compare at least two high‑yield savings accounts (HYSA) or "
+                "money‑market funds. Prioritize FDIC/NCUA insurance, same‑day "
+                "withdrawal, and APY. Open the chosen account and nickname it "
+                "“Safety Net”."
+            ),
+            step_objective="Select a liquid, low‑risk account for the fund.",
+        ),
+        ActivityStep(
+            index=4,
+            title="Automate the Cashflow",
+            content=(
+                "Set up an automatic transfer from checking each payday for 10–15% "
+                "of net income (adjust if you’re also allocating to house savings). "
+                "Treat it like a non‑negotiable bill."
+            ),
+            step_objective=(
+                "Create a default system that funds the emergency account without manual effort."
+            ),
+        ),
+        ActivityStep(
+            index=5,
+            title="Stress‑Test & Reflect",
+            content=(
+                "Imagine a sudden layoff or $3k bike accident bill. Would 6 months "
+                "feel sufficient? Journal one paragraph on your emotional reaction "
+                "to these scenarios and any tweaks you’d make."
+            ),
+            step_objective=(
+                "Evaluate psychological comfort and refine the target or timeline."
+            ),
+        ),
+        ActivityStep(
+            index=6,
+            title="Schedule Quarterly Health Checks",
+            content=(
+                "Add a recurring calendar event to verify balance, APY, and "
+                "contribution rate. Adjust if expenses or income change."
+            ),
+            step_objective=(
+                "Ensure the fund stays right‑sized and optimized over time."
+            ),
+        ),
+    ],
+    glossary={
+        "Emergency fund": "Cash reserve for unexpected expenses or income gaps.",
+        "Liquidity": "Ease and speed of converting assets to cash without loss.",
+        "Opportunity cost": "Potential gains you miss by choosing one option over another.",
+        "HYSA": "High‑yield savings account offering higher interest than regular savings.",
+    },
+    alternative_methods=[
+        "Use a paper ledger instead of a spreadsheet for expense tallying.",
+        "If automation feels scary, set a monthly phone reminder to transfer funds manually.",
+    ],
+    level=ActivityLevel.Intermediate,
+)
 
 
 class ChatActivityState(BaseModel):
     messages: Messages
     onboarding_data: OnboardingDataComplete = Field(
-        default=OnboardingDataComplete(
-            life_stage="Professional",
-            profession="Software Engineer",
-            age_range="30-39",
-            personal_context=PersonalContext(
-                hobbies=["reading", "cycling"],
-                family_status="Single",
-            ),
-            financial_goals=["Save for a house", "Build an emergency fund"],
-            financial_interests=["Investing", "Budgeting"],
-            financial_concerns=["Managing debt", "Saving enough"],
-            financial_knowledge_level="Intermediate",
-            previous_experience=[
-                "Has invested in stocks",
-                "Attended a finance workshop",
-            ],
-        ),
+        default_factory=lambda: default_onboarding_data,
         description="Onboarding data",
     )
     activity: Activity = Field(
-        default=Activity(
-            title="Rapid Emergency Fund Blueprint for the Solo Engineer",
-            description=(
-                "Build a resilient emergency fund tailored to your single‑income, "
-                "tech‑professional lifestyle so unexpected costs never derail your "
-                "house‑saving plans."
-            ),
-            overall_objective=(
-                "Have a fully funded, 6‑month emergency fund housed in the right account "
-                "and an automated system to keep it on track."
-            ),
-            background=ActivityBackground(
-                concepts=[
-                    "emergency fund",
-                    "living expenses",
-                    "liquidity",
-                    "opportunity cost",
-                ],
-                content=(
-                    "An emergency fund is a cash buffer (usually 3–6 months of essential "
-                    "living expenses) you can tap when life throws surprises—job loss, "
-                    "medical bills, bike repairs. Liquidity means how quickly you can "
-                    "access money without losing value; emergency funds need high liquidity "
-                    "(think high‑yield savings accounts). While cash earns less than "
-                    "investments (opportunity cost), it shields you from selling stocks at "
-                    "a loss. As a single software engineer, you rely solely on your income, "
-                    "so a 6‑month cushion minimizes risk and protects your bigger goal: "
-                    "buying a house."
-                ),
-            ),
-            steps=[
-                ActivityStep(
-                    index=1,
-                    title="Tally Your Core Living Expenses",
-                    content=(
-                        "Export the last 3 months of transactions from your bank or budgeting "
-                        "app. Write or code a quick script to categorize rent, food, utilities, "
-                        "insurance, transport, and minimum debt payments. Average each category "
-                        "to get one month of core costs."
-                    ),
-                    step_objective="Establish an accurate monthly baseline for essential expenses.",
-                ),
-                ActivityStep(
-                    index=2,
-                    title="Set Your Fund Size Target",
-                    content=(
-                        "Multiply the monthly core cost by 6 (or 4 if you feel your job is "
-                        "ultra‑stable, 9 if you want extra security). Note the final dollar "
-                        "amount; this is your emergency‑fund ‘definition of done’."
-                    ),
-                    step_objective="Define a specific, measurable emergency‑fund goal.",
-                ),
-                ActivityStep(
-                    index=3,
-                    title="Pick a Parking Spot",
-                    content=(
-                        "Compare at least two high‑yield savings accounts (HYSA) or "
-                        "money‑market funds. Prioritize FDIC/NCUA insurance, same‑day "
-                        "withdrawal, and APY. Open the chosen account and nickname it "
-                        "“Safety Net”."
-                    ),
-                    step_objective="Select a liquid, low‑risk account for the fund.",
-                ),
-                ActivityStep(
-                    index=4,
-                    title="Automate the Cashflow",
-                    content=(
-                        "Set up an automatic transfer from checking each payday for 10–15% "
-                        "of net income (adjust if you’re also allocating to house savings). "
-                        "Treat it like a non‑negotiable bill."
-                    ),
-                    step_objective=(
-                        "Create a default system that funds the emergency account without manual effort."
-                    ),
-                ),
-                ActivityStep(
-                    index=5,
-                    title="Stress‑Test & Reflect",
-                    content=(
-                        "Imagine a sudden layoff or $3k bike accident bill. Would 6 months "
-                        "feel sufficient? Journal one paragraph on your emotional reaction "
-                        "to these scenarios and any tweaks you’d make."
-                    ),
-                    step_objective=(
-                        "Evaluate psychological comfort and refine the target or timeline."
-                    ),
-                ),
-                ActivityStep(
-                    index=6,
-                    title="Schedule Quarterly Health Checks",
-                    content=(
-                        "Add a recurring calendar event to verify balance, APY, and "
-                        "contribution rate. Adjust if expenses or income change."
-                    ),
-                    step_objective=(
-                        "Ensure the fund stays right‑sized and optimized over time."
-                    ),
-                ),
-            ],
-            glossary={
-                "Emergency fund": "Cash reserve for unexpected expenses or income gaps.",
-                "Liquidity": "Ease and speed of converting assets to cash without loss.",
-                "Opportunity cost": "Potential gains you miss by choosing one option over another.",
-                "HYSA": "High‑yield savings account offering higher interest than regular savings.",
-            },
-            alternative_methods=[
-                "Use a paper ledger instead of a spreadsheet for expense tallying.",
-                "If automation feels scary, set a monthly phone reminder to transfer funds manually.",
-            ],
-            level=ActivityLevel.Intermediate,
-        )
+        default_factory=lambda: default_activity,
     )
     progress: Annotated[ActivityProgress | None, get_activity_progress] = Field(
         default=None,
@@ -235,16 +234,29 @@ async def update_activity_progress(  # type: ignore
         str,
         InjectedToolCallId,
     ],
+    state: Annotated[ChatActivityState, InjectedState],
     progress: ActivityProgress,
 ):
     """Update the progress of the activity. Full progress is required to be provided even if there are not started steps."""
-    await adispatch_custom_event(
-        "progress_updated",
-        progress.model_dump(),
-    )
+    if progress == state.progress:
+        # The model re-sent the current progress; skip the event and the state write.
+        return Command(  # type: ignore
+            update={
+                "messages": [
+                    ToolMessage(
+                        "Progress is already up to date",
+                        tool_call_id=tool_call_id,
+                    )
+                ],
+            },
+        )
+
+    # Sent on the graph's "custom" stream; the router frames it as a
+    # `progress_updated` event.
+    get_stream_writer()(progress.model_dump())
     return Command(  # type: ignore
         update={
-            "progress": progress.model_dump(),
+            "progress": progress,
             "messages": [
                 ToolMessage(
                     "Sucessfully looked up user progress",
@@ -259,29 +271,7 @@ tools = [update_activity_progress]
 tool_node = ToolNode(tools=tools)
 
 
-async def chat_activity(
-    state: ChatActivityState, config: RunnableConfig
-) -> BotResponse:
-    configuration = Configuration.from_runnable_config(config)
-
-    messages = state.messages
-    onboarding_data = state.onboarding_data
-    activity = state.activity
-    progress = state.progress
-
-    if progress is None:
-        progress = ActivityProgress(
-            steps=[
-                ActivityStepProgress(index=i, status="Not started")
-                for i in range(1, len(activity.steps) + 1)
-            ]
-        )
-
-    onboarding_data_str = format_as_xml(onboarding_data)
-    activity_str = format_as_xml(activity)
-    progress_str = format_as_xml(progress)
-
-    system_prompt = """\
+CHAT_ACTIVITY_SYSTEM_PROMPT = """\
 You are InversaAI, an expert, friendly, and highly adaptive financial learning companion. Your mission is to guide the user step-by-step through a personalized financial activity, making the experience interactive, practical, and confidence-building.
 
 **Your Role:**
@@ -355,24 +345,96 @@ You are InversaAI—the user's trusted guide to mastering their financial goals,
 Now, take a deep breath and let's get started!
 """
 
-    prompt = ChatPromptTemplate.from_messages(  # type: ignore
-        [
-            ("system", system_prompt),
-            MessagesPlaceholder(variable_name="messages"),
-        ]
+
+@clears_with_http_client
+@cache
+def get_chat_activity_llm(
+    model: str = "gpt-4.1",
+) -> Runnable[LanguageModelInput, BaseMessage]:
+    """
+    Bind the tools to the chat model once and reuse the binding for every turn.
+
+    Tools use strict schemas so OpenAI validates the arguments server-side.
+    """
+    return get_chat_llm(model=model, temperature=0.0).bind_tools(
+        tools=tools, strict=True
+    )
+
+
+def select_chat_activity_model(messages: list[BaseMessage]) -> str:
+    """
+    Route short follow-up messages to the faster model.
+
+    The opening turn, long messages, and turns resuming after a tool call (where
+    progress just changed) stay on the full model.
+    """
+    last_message = messages[-1] if messages else None
+    if (
+        len(messages) > 1
+        and isinstance(last_message, HumanMessage)
+        and isinstance(last_message.content, str)
+        and len(last_message.content) < settings.CHAT_FAST_MODEL_MAX_CHARS
+    ):
+        return settings.CHAT_FAST_MODEL
+    return "gpt-4.1"
+
+
+def trim_history(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """
+    Keep only the most recent messages so prompt size stays bounded.
+
+    The window always starts on a human message, so an AI tool call is never
+    separated from its tool responses. When the current turn alone is longer than
+    the limit, it is kept whole from its human message rather than dropped.
+    """
+    if len(messages) <= settings.CHAT_HISTORY_MAX_MESSAGES:
+        return messages
+
+    trimmed: list[BaseMessage] = trim_messages(
+        messages,
+        strategy="last",
+        token_counter=len,
+        max_tokens=settings.CHAT_HISTORY_MAX_MESSAGES,
+        start_on="human",
+    )
+    if any(isinstance(message, HumanMessage) for message in trimmed):
+        return trimmed
+
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return messages[index:]
+    return messages
+
+
+async def chat_activity(
+    state: ChatActivityState, config: RunnableConfig
+) -> BotResponse:
+    configuration = Configuration.from_runnable_config(config)
+
+    messages = state.messages
+    onboarding_data = state.onboarding_data
+    activity = state.activity
+    progress = state.progress
+
+    if progress is None:
+        progress = ActivityProgress(
+            steps=[
+                ActivityStepProgress(index=i, status="Not started")
+                for i in range(1, len(activity.steps) + 1)
+            ]
+        )
+
+    # The onboarding data and activity don't change within a thread, so reuse the
+    # XML cached on each instance; progress changes turn to turn.
+    system_prompt = CHAT_ACTIVITY_SYSTEM_PROMPT.format(
+        onboarding_data=onboarding_data.xml,
+        activity=activity.xml,
+        progress=format_as_xml(progress),
     )
 
-    llm = ChatOpenAI(temperature=0.0, model="gpt-4.1")
-    llm_with_tools = llm.bind_tools(tools=tools)
-    llm_with_tools = prompt | llm_with_tools
-
-    response = await llm_with_tools.ainvoke(
-        {  # type: ignore
-            "messages": [("system", system_prompt)] + messages,
-            "onboarding_data": onboarding_data_str,
-            "activity": activity_str,
-            "progress": progress_str,
-        }
+    llm = get_chat_activity_llm(select_chat_activity_model(messages))
+    response = await llm.ainvoke(
+        [SystemMessage(content=system_prompt), *trim_history(messages)]
     )
 
     return {
@@ -393,5 +455,7 @@ chat_activity_agent_builder.add_edge("tools", "chat_activity")
 chat_activity_agent_builder.add_edge("chat_activity", END)
 
 
+@lru_cache(maxsize=4)
 def get_graph(checkpointer: AsyncPostgresSaver | None = None) -> CompiledStateGraph:
+    """Compile the graph once per checkpointer."""
     return chat_activity_agent_builder.compile(checkpointer=checkpointer)
@@ -0,0 +1,40 @@
+import hashlib
+import time
+from typing import Any
+
+import orjson
+
+
+class LLMCache:
+    """In-process cache for LLM responses keyed by a hash of the request inputs."""
+
+    def __init__(self, ttl: float = 3600, max_size: int = 1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: dict[str, tuple[float, str]] = {}
+
+    @staticmethod
+    def make_key(payload: dict[str, Any]) -> str:
+        data = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS, default=str)
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        if key not in self._entries and len(self._entries) >= self.max_size:
+            # Dicts keep insertion order, so the first key is the oldest entry.
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+
+activity_cache = LLMCache(ttl=3600)
@@ -1,31 +1,18 @@
 from typing import Any
 
-from langchain_openai import ChatOpenAI
+import orjson
 
+from app.activity.cache import activity_cache
 from app.activity.create_from_onboarding import Activity
+from app.activity.llm import get_structured_llm
 from app.activity.models import ActivityLevel
 
-
-async def create_activity_from_concepts(
-    *,
-    level: ActivityLevel,
-    concepts: list[str],
-    guided_description: str | None = None,
-    user_context: dict[str, Any] | None = None,  # Optionally pass user info for context
-) -> Activity:
-    """
-    Generate a single Activity based on level, concepts, and optional description/context.
-    """
-    llm = ChatOpenAI(model="o3-2025-04-16")
-    llm = ChatOpenAI(model="gpt-4.1")
-
-    # Compose the system prompt
-    system_prompt = f"""\
+ACTIVITY_SYSTEM_PROMPT = """\
 You are a financial education expert. Your task is to design a single, self-contained learning activity for a user.
 
 Guidelines:
 - The activity should be at the '{level}' level.
-- It must focus on the following financial concepts: {", ".join(concepts)}.
+- It must focus on the following financial concepts: {concepts}.
 - If a guided description is provided, use it to shape the activity's context, background, or scenario.
 - If user context is provided, use it to personalize the activity (e.g., profession, age, hobbies, goals).
 - The activity should include:
@@ -45,10 +32,45 @@ Guidelines:
 
 All the generated content should be markdown-formatted.
 
-{f"Guided description: {guided_description}" if guided_description else ""}
-{f"User context: {user_context}" if user_context else ""}
+{guided_description}
+{user_context}
 """
 
+
+async def create_activity_from_concepts(
+    *,
+    level: ActivityLevel,
+    concepts: list[str],
+    guided_description: str | None = None,
+    user_context: dict[str, Any] | None = None,  # Optionally pass user info for context
+) -> Activity:
+    """
+    Generate a single Activity based on level, concepts, and optional description/context.
+    """
+    if not concepts:
+        raise ValueError("At least one concept is required")
+
+    cache_key = activity_cache.make_key(
+        {
+            "level": level,
+            "concepts": sorted(concepts),
+            "guided": guided_description,
+            "ctx": user_context,
+        }
+    )
+    if cached := activity_cache.get(cache_key):
+        return Activity.model_validate_json(cached)
+
+    # Compose the system prompt
+    system_prompt = ACTIVITY_SYSTEM_PROMPT.format(
+        level=level,
+        concepts=", ".join(concepts),
+        guided_description=f"Guided description: {guided_description}"
+        if guided_description
+        else "",
+        user_context=f"User context: {user_context}" if user_context else "",
+    )
+
     # Prepare the user message (concepts, level, etc.)
     user_message = {
         "level": level,
@@ -58,18 +80,21 @@ All the generated content should be markdown-formatted.
     }
 
     # Call the LLM with structured output
-    activity = await llm.with_structured_output(
-        schema=Activity,
-        strict=True,
-        method="function_calling",
-    ).ainvoke(
+    llm = get_structured_llm(Activity, model="gpt-4.1")
+    activity = await llm.ainvoke(
         [
             ("system", system_prompt),
-            ("user", str(user_message)),
+            (
+                "user",
+                orjson.dumps(
+                    user_message, option=orjson.OPT_INDENT_2, default=str
+                ).decode("utf-8"),
+            ),
         ]
     )
 
     if not isinstance(activity, Activity):
         raise ValueError(f"Invalid activity structure {activity=}")
 
+    activity_cache.set(cache_key, activity.model_dump_json())
     return activity
@@ -1,62 +1,83 @@
-from typing import Literal
+from functools import cached_property
+from typing import Annotated, Literal, TypedDict
 
-from langchain_openai import ChatOpenAI
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from pydantic_ai import format_as_xml
 
+from app.activity.llm import get_structured_llm
 from app.activity.models import ActivityLevel
 from app.onboarding.agent import PersonalContext
 
 
-class ActivityBackground(BaseModel):
-    concepts: list[str] = Field(
-        description=(
-            "A list of key financial concepts or terms that will be introduced or "
-            "explained in this activity. Each concept should be a short phrase or "
-            "single word, e.g., 'budgeting', 'compound interest', 'emergency fund'."
+class ActivityBackground(TypedDict):
+    concepts: Annotated[
+        list[str],
+        Field(
+            description=(
+                "A list of key financial concepts or terms that will be introduced or "
+                "explained in this activity. Each concept should be a short phrase or "
+                "single word, e.g., 'budgeting', 'compound interest', 'emergency fund'."
+            ),
         ),
-    )
-    content: str = Field(
-        description=(
-            "A comprehensive, user-friendly teaching explanation that covers each "
-            "concept listed in 'concepts'. This content should clearly define and "
-            "explain each concept, describe how they are related, and provide context "
-            "for why they matter to the user. The explanation should be tailored to "
-            "the user's background and designed to help them understand the knowledge "
-            "needed to successfully complete the activity."
-        )
-    )
+    ]
+    content: Annotated[
+        str,
+        Field(
+            description=(
+                "A comprehensive, user-friendly teaching explanation that covers each "
+                "concept listed in 'concepts'. This content should clearly define and "
+                "explain each concept, describe how they are related, and provide context "
+                "for why they matter to the user. The explanation should be tailored to "
+                "the user's background and designed to help them understand the knowledge "
+                "needed to successfully complete the activity."
+            )
+        ),
+    ]
 
 
-class ActivityStep(BaseModel):
-    index: int = Field(
-        description=(
-            "The step number within the activity, starting from 1. Steps should be "
-            "ordered sequentially to guide the user through the activity."
+class ActivityStep(TypedDict):
+    index: Annotated[
+        int,
+        Field(
+            description=(
+                "The step number within the activity, starting from 1. Steps should be "
+                "ordered sequentially to guide the user through the activity."
+            ),
         ),
-    )
-    title: str = Field(
-        description=(
-            "A short, descriptive title for this step. It should summarize the main "
-            "action or focus of the step, e.g., 'List Your Monthly Expenses'."
+    ]
+    title: Annotated[
+        str,
+        Field(
+            description=(
+                "A short, descriptive title for this step. It should summarize the main "
+                "action or focus of the step, e.g., 'List Your Monthly Expenses'."
+            ),
         ),
-    )
-    content: str = Field(
-        description=(
-            "A clear, actionable instruction or explanation for this step. This "
-            "should guide the user on what to do, think about, or discuss."
+    ]
+    content: Annotated[
+        str,
+        Field(
+            description=(
+                "A clear, actionable instruction or explanation for this step. This "
+                "should guide the user on what to do, think about, or discuss."
+            ),
         ),
-    )
-    step_objective: str = Field(
-        description=(
-            "A brief statement of the specific learning or action objective for this "
-            "step. It should clarify what the user will achieve or understand by "
-            "completing this step."
+    ]
+    step_objective: Annotated[
+        str,
+        Field(
+            description=(
+                "A brief statement of the specific learning or action objective for this "
+                "step. It should clarify what the user will achieve or understand by "
+                "completing this step."
+            ),
         ),
-    )
+    ]
 
 
 class Activity(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     title: str = Field(
         description=(
             "The name of the activity. This should be engaging and clearly indicate "
@@ -107,7 +128,14 @@ class Activity(BaseModel):
         ),
     )
 
-    def as_xml(self) -> str:
+    @cached_property
+    def xml(self) -> str:
+        """
+        XML rendering of the model, computed once per instance.
+
+        The model is frozen so the cache can't go stale; build a new instance
+        instead of `model_copy(update=...)`, which would carry the cached value over.
+        """
         return format_as_xml(self)
 
 
@@ -123,6 +151,8 @@ class Activities(BaseModel):
 class OnboardingDataComplete(BaseModel):
     """All relevant information collected during the onboarding process."""
 
+    model_config = ConfigDict(frozen=True)
+
     # 1. Life Stage
     life_stage: Literal["Student", "Professional", "Retired", "Parent"] = Field(
         description=(
@@ -213,16 +243,20 @@ class OnboardingDataComplete(BaseModel):
         ),
     )
 
-    def as_xml(self) -> str:
+    @cached_property
+    def xml(self) -> str:
+        """
+        XML rendering of the model, computed once per instance.
+
+        The model is frozen so the cache can't go stale; build a new instance
+        instead of `model_copy(update=...)`, which would carry the cached value over.
+        """
         return format_as_xml(self)
 
 
 async def create_activities_from_onboarding_data(
     onboarding_data: OnboardingDataComplete,
 ):
-    llm = ChatOpenAI(model="o3-2025-04-16")
-    llm = ChatOpenAI(model="gpt-4.1")
-
     system_prompt = """\
 You are an expert financial educator and curriculum designer. Your task is to create a set of highly tailored, step-by-step teaching activities for a user, based on their onboarding information. The activities should be cohesive, relevant, and designed to help the user learn new financial concepts by connecting them to their personal context, goals, and environment.
 
@@ -253,10 +287,8 @@ Example activity titles:
 Be creative, empathetic, and practical. Focus on helping the user achieve their financial goals in a way that feels relevant and achievable in their real life, and that increases their financial literacy and confidence.
 Only generate TWO activities. Activities should be always in english"""
 
-    activities = await llm.with_structured_output(
-        schema=Activities,
-        strict=True,
-    ).ainvoke(
+    llm = get_structured_llm(Activities, model="gpt-4.1")
+    activities = await llm.ainvoke(
         [
             ("system", system_prompt),
             ("user", onboarding_data.model_dump_json(indent=2)),
@@ -0,0 +1,102 @@
+from collections.abc import Callable
+from functools import cache, lru_cache
+from typing import Any, Literal, Protocol
+
+import httpx
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel
+
+from app.config import settings
+
+
+@lru_cache(maxsize=1)
+def get_http_async_client() -> httpx.AsyncClient:
+    """
+    Get the HTTP client shared by every OpenAI client.
+
+    One keep-alive pool means bursts of concurrent calls reuse open TLS connections
+    instead of each client handshaking on its own.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+    )
+
+
+# Set on each OpenAI client; the SDK sends its own per-request timeout, which
+# overrides the one on the shared HTTP client.
+LLM_REQUEST_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+
+class _Cached(Protocol):
+    def cache_clear(self) -> None: ...
+
+
+_http_client_caches: list[Callable[[], None]] = []
+
+
+def clears_with_http_client[CachedT: _Cached](cached: CachedT) -> CachedT:
+    """
+    Clear a cached client builder whenever the shared HTTP client is closed.
+
+    Cached clients hold on to the HTTP client, so reusing them after it is closed
+    would fail.
+    """
+    _http_client_caches.append(cached.cache_clear)
+    return cached
+
+
+async def close_http_async_client() -> None:
+    if get_http_async_client.cache_info().currsize:
+        await get_http_async_client().aclose()
+        get_http_async_client.cache_clear()
+    for cache_clear in _http_client_caches:
+        cache_clear()
+
+
+def get_model_kwargs() -> dict[str, Any]:
+    """
+    Extra request parameters for every OpenAI call.
+
+    `service_tier` is sent only in latency mode; otherwise requests are left as is.
+    """
+    if settings.LLM_LATENCY_MODE:
+        return {"service_tier": "priority"}
+    return {}
+
+
+@clears_with_http_client
+@cache
+def get_structured_llm(
+    schema: type[BaseModel],
+    model: str = "gpt-4.1",
+    method: Literal["function_calling", "json_mode", "json_schema"] = "json_schema",
+) -> Runnable[LanguageModelInput, dict[str, Any] | BaseModel]:
+    """
+    Get a cached structured-output runnable for the given schema and model.
+
+    Building the client and deriving the schema is done once per combination
+    and reused across requests. When `LLM_LATENCY_MODE` is enabled, requests
+    are served from OpenAI's priority processing tier.
+    """
+    llm = ChatOpenAI(
+        model=model,
+        timeout=LLM_REQUEST_TIMEOUT,
+        model_kwargs=get_model_kwargs(),
+        http_async_client=get_http_async_client(),
+    )
+    return llm.with_structured_output(schema=schema, strict=True, method=method)
+
+
+@clears_with_http_client
+@cache
+def get_chat_llm(model: str = "gpt-4.1", temperature: float = 0.0) -> ChatOpenAI:
+    """Get a cached chat model client for conversational agents."""
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        timeout=LLM_REQUEST_TIMEOUT,
+        model_kwargs=get_model_kwargs(),
+        http_async_client=get_http_async_client(),
+    )
@@ -3,6 +3,7 @@ from datetime import UTC, datetime
 from enum import StrEnum
 from typing import Any
 
+from sqlalchemy import Index, func, text
 from sqlalchemy.dialects.postgresql import JSONB, TIMESTAMP
 from sqlmodel import Column, Field, SQLModel
 
@@ -15,6 +16,14 @@ class ActivityLevel(StrEnum):
 
 class Activity(SQLModel, table=True):
     __tablename__ = "activities"
+    __table_args__ = (
+        Index(
+            "ix_activities_public",
+            "level",
+            "created_at",
+            postgresql_where=text("user_id IS NULL"),
+        ),
+    )
 
     id: uuid.UUID = Field(
         default_factory=uuid.uuid4,
@@ -25,6 +34,7 @@ class Activity(SQLModel, table=True):
     )
     user_id: str | None = Field(
         nullable=True,
+        index=True,
         description="The ID of the user associated with the activity.",
     )
     title: str = Field(nullable=False, description="The name of the activity.")
@@ -57,10 +67,17 @@ class Activity(SQLModel, table=True):
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(UTC),
         description="The timestamp when the activity was created.",
-        sa_column=Column(TIMESTAMP(timezone=True), nullable=False),
+        sa_column=Column(
+            TIMESTAMP(timezone=True), nullable=False, server_default=func.now()
+        ),
     )
     updated_at: datetime = Field(
         default_factory=lambda: datetime.now(UTC),
-        sa_column=Column(TIMESTAMP(timezone=True), nullable=False),
+        sa_column=Column(
+            TIMESTAMP(timezone=True),
+            nullable=False,
+            server_default=func.now(),
+            onupdate=func.now(),
+        ),
         description="The timestamp when the activity was last updated.",
     )
@@ -1,54 +1,100 @@
+import uuid
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
 from typing import Any
 
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import col, insert, select
 
-from app.activity.models import Activity
+from app.activity.models import Activity, ActivityLevel
+
+UNIQUE_VIOLATION = "23505"
 
 
 class ActivityRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_activity(self, id: str) -> Activity | None:
+    # Beginner to advanced, then newest first.
+    _catalog_order = (
+        # Compare against the column so each level is bound through its Enum type,
+        # which stores member names rather than values.
+        case(
+            (col(Activity.level) == ActivityLevel.Beginner, 1),
+            (col(Activity.level) == ActivityLevel.Intermediate, 2),
+            (col(Activity.level) == ActivityLevel.Advanced, 3),
+            else_=99,
+        ),
+        col(Activity.created_at).desc(),
+    )
+
+    @staticmethod
+    def _to_rows(activities: list[Activity]) -> list[dict[str, Any]]:
+        columns = [column.name for column in Activity.__table__.columns]  # type: ignore[attr-defined]
+        return [
+            {column: getattr(activity, column) for column in columns}
+            for activity in activities
+        ]
+
+    async def get_activity(self, id: uuid.UUID) -> Activity | None:
         query = select(Activity).where(Activity.id == id)
         result = await self.session.execute(query)
         return result.scalar_one_or_none()
 
-    async def get_public_activities(self) -> list[Activity]:
-        query = select(Activity).where(col(Activity.user_id).is_(None))
-        results = await self.session.execute(query)
-        return list(results.scalars().all())
-
-    async def get_user_activities(self, user_id: str) -> list[Activity]:
-        query = select(Activity).where(Activity.user_id == user_id)
-        results = await self.session.execute(query)
-        return list(results.scalars().all())
-
-    async def create_public_activity(self, activity: Activity) -> Activity:
-        query = select(Activity).where(Activity.id == str(activity.id))
+    async def get_public_activities_version(self) -> tuple[int, datetime | None]:
+        """Return the number of public activities and their latest update time."""
+        query = select(func.count(), func.max(col(Activity.updated_at))).where(
+            col(Activity.user_id).is_(None)
+        )
         result = await self.session.execute(query)
+        count, last_updated_at = result.one()
+        return count, last_updated_at
+
+    async def get_public_activities(
+        self, batch_size: int = 100
+    ) -> AsyncIterator[Activity]:
+        query = (
+            select(Activity)
+            .where(col(Activity.user_id).is_(None))
+            .order_by(*self._catalog_order)
+            .execution_options(yield_per=batch_size)
+        )
+        results = await self.session.stream_scalars(query)
+        async for activity in results:
+            yield activity
+
+    async def get_user_activities(self, user_id: str) -> Sequence[Activity]:
+        query = (
+            select(Activity)
+            .where(Activity.user_id == user_id)
+            .order_by(*self._catalog_order)
+        )
+        results = await self.session.execute(query)
+        return results.scalars().all()
 
-        if result.scalar_one_or_none():
-            raise ValueError("Activity already exists")
-
+    async def _add_activity(self, activity: Activity) -> Activity:
         self.session.add(activity)
-        await self.session.commit()
+        try:
+            await self.session.commit()
+        except IntegrityError as e:
+            await self.session.rollback()
+            # Only a unique violation means a duplicate; NOT NULL, FK and check
+            # failures are bugs and should surface as such.
+            if getattr(e.orig, "sqlstate", None) == UNIQUE_VIOLATION:
+                raise ValueError("Activity already exists") from e
+            raise
         return activity
 
-    async def create_user_activity(self, activity: Activity) -> Activity:
-        query = select(Activity).where(Activity.id == str(activity.id))
-        result = await self.session.execute(query)
-
-        if result.scalar_one_or_none():
-            raise ValueError("Activity already exists")
+    async def create_public_activity(self, activity: Activity) -> Activity:
+        return await self._add_activity(activity)
 
+    async def create_user_activity(self, activity: Activity) -> Activity:
         if activity.user_id is None:
             raise ValueError("Activity must have a user_id")
 
-        self.session.add(activity)
-        await self.session.commit()
-        return activity
+        return await self._add_activity(activity)
 
     async def create_public_activities(
         self, activities: list[Activity]
@@ -56,13 +102,7 @@ class ActivityRepository:
         if any(activity.user_id is not None for activity in activities):
             raise ValueError("All activities must be public")
 
-        data: list[dict[str, Any]] = []
-
-        for activity in activities:
-            data.append(activity.model_dump())
-
-        query = insert(Activity).values(data)
-        await self.session.execute(query)
+        await self.session.execute(insert(Activity), self._to_rows(activities))
         await self.session.commit()
         return activities
 
@@ -72,12 +112,6 @@ class ActivityRepository:
         if any(activity.user_id is None for activity in activities):
             raise ValueError("All activities must have a user_id")
 
-        data: list[dict[str, Any]] = []
-
-        for activity in activities:
-            data.append(activity.model_dump())
-
-        query = insert(Activity).values(data)
-        await self.session.execute(query)
+        await self.session.execute(insert(Activity), self._to_rows(activities))
         await self.session.commit()
         return activities
@@ -1,13 +1,15 @@
+from collections import OrderedDict
+from collections.abc import Sequence
 from datetime import datetime
 from typing import Annotated, Any, Literal
 from uuid import UUID
 
-import orjson
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Header, HTTPException, Query, Response
 from fastapi.responses import StreamingResponse
 from langchain_core.messages import AIMessageChunk, HumanMessage
-from langchain_core.runnables.schema import EventData
-from pydantic import BaseModel, Field
+from langchain_core.runnables import RunnableConfig
+from langgraph.types import StreamMode
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
 from app.activity.agent import (
     Activity,
@@ -25,11 +27,22 @@ from app.activity.create_from_onboarding import (
 from app.activity.dependencies import ActivityAgentDep, ActivityRepositoryDep
 from app.activity.models import Activity as ActivityModel
 from app.activity.models import ActivityLevel
+from app.routing import JiterJSONRoute
+from app.serialization import ORJSONResponse, ResponseMetadataEncoder, dumps
+from app.streaming import (
+    AI_MESSAGE_CHUNK_EVENT,
+    SSE_HEADERS,
+    coalesce_sse_frames,
+    format_sse,
+)
 
 chat_activity_router = APIRouter(
     prefix="/chat/activity",
     tags=["Activity Conversation"],
+    default_response_class=ORJSONResponse,
+    route_class=JiterJSONRoute,
 )
+# Frozen, so request defaults can share this instance instead of copying it.
 onboarding_data_example = OnboardingDataComplete(
     profession="Software Engineer",
     age_range="30-39",
@@ -160,6 +173,10 @@ activity_example = Activity(
     level=ActivityLevel.Intermediate,
 )
 
+# Dumped once so OpenAPI examples don't re-serialize the models.
+onboarding_data_example_json = onboarding_data_example.model_dump(mode="json")
+activity_example_json = activity_example.model_dump(mode="json")
+
 
 class ChatActivityRequest(BaseModel):
     """Request to chat activity."""
@@ -176,22 +193,57 @@ class ChatActivityRequest(BaseModel):
     )
     onboarding_data: OnboardingDataComplete = Field(
         description="Onboarding data to chat activity.",
-        default=onboarding_data_example,
+        default_factory=lambda: onboarding_data_example,
+        examples=[onboarding_data_example_json],
     )
     activity: Activity = Field(
         description="Activity to chat.",
+        examples=[activity_example_json],
+    )
+
+
+PROGRESS_UPDATED_EVENT = b"progress_updated"
+
+
+def handle_progress_updated(data: Any) -> bytes | None:
+    return format_sse(dumps(data), event=PROGRESS_UPDATED_EVENT)
+
+
+def handle_chat_activity_stream(
+    data: Any, encode_metadata: ResponseMetadataEncoder
+) -> bytes | None:
+    message_chunk, metadata = data
+
+    if metadata.get("langgraph_node") != "chat_activity":
+        return None
+
+    if not isinstance(message_chunk, AIMessageChunk):
+        return None
+
+    if message_chunk.additional_kwargs.get("tool_calls"):
+        return None
+
+    response_metadata = message_chunk.response_metadata
+    if response_metadata.get("finish_reason") == "tool_calls":
+        return None
+
+    return format_sse(
+        dumps(
+            {
+                "id": message_chunk.id,
+                "content": message_chunk.content,
+                "response_metadata": encode_metadata(response_metadata),
+            },
+        ),
+        event=AI_MESSAGE_CHUNK_EVENT,
     )
 
 
-def format_sse(data: str, event: str | None = None) -> bytes:
-    """Format a message as an SSE event."""
-    msg = ""
-    if event:
-        msg += f"event: {event}\n"
-    for line in data.rstrip().splitlines():
-        msg += f"data: {line}\n"
-    msg += "\n"
-    return msg.encode("utf-8")
+# The graph only writes progress to "custom".
+STREAM_MODES: list[StreamMode] = ["custom", "messages"]
+
+
+CHAT_ACTIVITY_BASE_CONFIG: RunnableConfig = {"run_name": "chat_activity"}
 
 
 @chat_activity_router.post("/")
@@ -208,80 +260,40 @@ async def chat_activity(
     Returns:
         StreamingResponse: A streaming response with AI message chunks and progress updates.
     """
-    print(request.model_dump_json(indent=2))
     human_message = HumanMessage(content=request.message)
 
+    # Keep this an async generator; Starlette iterates sync ones in a threadpool.
     async def stream_response():
-        async for event in activity_agent.astream_events(
-            stream_mode=["custom", "messages"],
-            version="v2",
+        # Per stream, so concurrent streams don't evict each other's metadata.
+        encode_metadata = ResponseMetadataEncoder()
+        async for mode, data in activity_agent.astream(
+            stream_mode=STREAM_MODES,
             config={
+                **CHAT_ACTIVITY_BASE_CONFIG,
                 "configurable": {
                     "thread_id": request.thread_id,
                     "user_full_name": request.user_full_name,
                 },
-                "run_name": "chat_activity",
             },
             input={
                 "messages": [human_message],
-                "onboarding_data": request.onboarding_data.model_dump(),
-                "activity": request.activity.model_dump(),
+                "onboarding_data": request.onboarding_data,
+                "activity": request.activity,
                 "progress": None,
             },
         ):
-            if (
-                event["event"] == "on_custom_event"
-                and event["name"] == "progress_updated"
-            ):
-                data = event["data"]
-                yield format_sse(
-                    orjson.dumps(
-                        data,
-                    ).decode("utf-8"),
-                    event="progress_updated",
-                )
-
-            if event["event"] == "on_chain_stream" and event["name"] == "chat_activity":
-                data: EventData | Any = event["data"]
-                chunk = data["chunk"]
-
-                if not isinstance(chunk, tuple):
-                    continue
-
-                _, message_chunk = chunk
-
-                if not isinstance(message_chunk, tuple):
-                    continue
-
-                message_chunk, metadata = message_chunk
-
-                if not isinstance(message_chunk, AIMessageChunk):
-                    continue
-
-                if message_chunk.additional_kwargs.get("tool_calls", []):
-                    continue
-
-                if (
-                    message_chunk.response_metadata.get("finish_reason", None)
-                    == "tool_calls"
-                ):
-                    continue
-
-                langgraph_node = metadata.get("langgraph_node", None)
-
-                if langgraph_node == "chat_activity":
-                    yield format_sse(
-                        orjson.dumps(
-                            {
-                                "id": message_chunk.id,
-                                "content": message_chunk.content,
-                                "response_metadata": message_chunk.response_metadata,
-                            },
-                        ).decode("utf-8"),
-                        event="ai_message_chunk",
-                    )
-
-    return StreamingResponse(stream_response(), media_type="text/event-stream")
+            if mode == "messages":
+                frame = handle_chat_activity_stream(data, encode_metadata)
+            else:
+                frame = handle_progress_updated(data)
+            if frame is not None:
+                yield frame
+
+    return StreamingResponse(
+        coalesce_sse_frames(stream_response()),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
 
 class HumanMessageData(BaseModel):
@@ -298,6 +310,11 @@ class AIMessageData(BaseModel):
 
 Message = Annotated[HumanMessageData | AIMessageData, Field(discriminator="type")]
 
+MESSAGE_DATA_TYPES: dict[str, type[HumanMessageData | AIMessageData]] = {
+    "human": HumanMessageData,
+    "ai": AIMessageData,
+}
+
 
 class ChatActivityStateRequest(BaseModel):
     """Request to chat activity state."""
@@ -314,7 +331,12 @@ class GetStateResponse(BaseModel):
     progress: ActivityProgress | None
 
 
-@chat_activity_router.get("/")
+# Checkpoints are immutable, so a checkpoint id always maps to the same response.
+STATE_RESPONSE_CACHE_SIZE = 1024
+state_response_cache: OrderedDict[str, str] = OrderedDict()
+
+
+@chat_activity_router.get("/", response_model=GetStateResponse)
 async def get_state(
     activity_agent: ActivityAgentDep,
     request: ChatActivityStateRequest = Query(),
@@ -332,34 +354,36 @@ async def get_state(
     """
     config = {"configurable": {"thread_id": request.thread_id}}
     state = await activity_agent.aget_state(config=config)
-    # return state
+    checkpoint_id = state.config.get("configurable", {}).get("checkpoint_id")
+    if checkpoint_id and (cached := state_response_cache.get(checkpoint_id)):
+        state_response_cache.move_to_end(checkpoint_id)
+        return Response(cached, media_type="application/json")
+
     messages = state.values["messages"]
-    onboarding_data = OnboardingDataComplete.model_validate(
-        state.values["onboarding_data"]
-    )
-    activity = Activity.model_validate(state.values["activity"])
-    progress_data = state.values["progress"]
-    return {
-        "messages": [
-            {
-                "id": message.id,
-                "type": message.type,
-                "content": message.content,
-            }
+    # The checkpointer restores the state's own validated models, so pass them
+    # through instead of validating them again.
+    response = GetStateResponse.model_construct(
+        messages=[
+            MESSAGE_DATA_TYPES[message.type](id=message.id, content=message.content)
             for message in messages
-            if message.type in ["human", "ai"]
+            if message.type in MESSAGE_DATA_TYPES
         ],
-        "onboarding_data": onboarding_data.model_dump(),
-        "activity": activity.model_dump(),
-        "progress": ActivityProgress.model_validate(progress_data)
-        if progress_data
-        else None,
-    }
+        onboarding_data=state.values["onboarding_data"],
+        activity=state.values["activity"],
+        progress=state.values["progress"] or None,
+    )
+    content = response.model_dump_json()
+    if checkpoint_id:
+        state_response_cache[checkpoint_id] = content
+        if len(state_response_cache) > STATE_RESPONSE_CACHE_SIZE:
+            state_response_cache.popitem(last=False)
+    return Response(content, media_type="application/json")
 
 
 activity_router = APIRouter(
     prefix="/activity",
     tags=["Activity Management"],
+    default_response_class=ORJSONResponse,
 )
 
 
@@ -368,7 +392,8 @@ class CreateActivityFromOnboardingRequest(BaseModel):
 
     onboarding_data: OnboardingDataComplete = Field(
         description="Onboarding data to create activity from.",
-        default=onboarding_data_example,
+        default_factory=lambda: onboarding_data_example,
+        examples=[onboarding_data_example_json],
     )
 
 
@@ -405,6 +430,7 @@ class CreateActivityFromConceptsRequest(BaseModel):
         description="The level of the activity.",
     )
     concepts: list[str] = Field(
+        min_length=1,
         description="A list of financial concepts to include in the activity.",
     )
     guided_description: str | None = Field(
@@ -486,6 +512,8 @@ class CreateUserActivityRequest(CreatePublicActivityRequest):
 class ActivityResponse(BaseModel):
     """Response for activity creation."""
 
+    model_config = ConfigDict(from_attributes=True)
+
     id: UUID
     user_id: str | None
     title: str
@@ -500,6 +528,22 @@ class ActivityResponse(BaseModel):
     updated_at: datetime
 
 
+def activity_json_response(
+    activity: ActivityModel, headers: dict[str, str] | None = None
+) -> Response:
+    """
+    Serialize an activity row straight to JSON.
+
+    Returning the model would make FastAPI dump it, re-validate it against the
+    `response_model` and encode it again; this does a single validate + dump.
+    """
+    return Response(
+        ActivityResponse.model_validate(activity).model_dump_json(),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
 @activity_router.post(
     "/public", response_model=ActivityResponse, tags=["Activity Creation"]
 )
@@ -526,8 +570,8 @@ async def create_public_activity(
         title=request.title,
         description=request.description,
         overall_objective=request.overall_objective,
-        background=request.background.model_dump(),
-        steps=[step.model_dump() for step in request.steps],
+        background=dict(request.background),
+        steps=list(request.steps),
         glossary=request.glossary,
         alternative_methods=request.alternative_methods,
         level=request.level,
@@ -535,20 +579,7 @@ async def create_public_activity(
 
     try:
         created_activity = await activity_repository.create_public_activity(activity)
-        return ActivityResponse(
-            id=created_activity.id,
-            user_id=created_activity.user_id,
-            title=created_activity.title,
-            description=created_activity.description,
-            overall_objective=created_activity.overall_objective,
-            background=created_activity.background,
-            steps=created_activity.steps,
-            glossary=created_activity.glossary,
-            alternative_methods=created_activity.alternative_methods,
-            level=created_activity.level,
-            created_at=created_activity.created_at,
-            updated_at=created_activity.updated_at,
-        )
+        return activity_json_response(created_activity)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -579,8 +610,8 @@ async def create_user_activity(
         title=request.title,
         description=request.description,
         overall_objective=request.overall_objective,
-        background=request.background.model_dump(),
-        steps=[step.model_dump() for step in request.steps],
+        background=dict(request.background),
+        steps=list(request.steps),
         glossary=request.glossary,
         alternative_methods=request.alternative_methods,
         level=request.level,
@@ -588,35 +619,55 @@ async def create_user_activity(
 
     try:
         created_activity = await activity_repository.create_user_activity(activity)
-        return ActivityResponse(
-            id=created_activity.id,
-            user_id=created_activity.user_id,
-            title=created_activity.title,
-            description=created_activity.description,
-            overall_objective=created_activity.overall_objective,
-            background=created_activity.background,
-            steps=created_activity.steps,
-            glossary=created_activity.glossary,
-            alternative_methods=created_activity.alternative_methods,
-            level=created_activity.level,
-            created_at=created_activity.created_at,
-            updated_at=created_activity.updated_at,
-        )
+        return activity_json_response(created_activity)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def make_etag(*parts: object) -> str:
+    """Build a weak ETag from values that change whenever the resource does."""
+    version = "-".join(
+        str(int(part.timestamp() * 1_000_000))
+        if isinstance(part, datetime)
+        else str(part)
+        for part in parts
+    )
+    return f'W/"{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an `If-None-Match` header, which may list several ETags or be `*`."""
+    if if_none_match is None:
+        return False
+    tags = {tag.strip() for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
 class ActivityListResponse(BaseModel):
     """Response for activity listing."""
 
     data: list[ActivityResponse]
 
 
+activity_rows_adapter = TypeAdapter(list[ActivityModel])
+
+
+def activity_list_json(activities: Sequence[ActivityModel]) -> bytes:
+    """
+    Serialize activity rows as an `ActivityListResponse` body.
+
+    The rows come from our own table and already have the response's fields, so they
+    are dumped as-is instead of being validated into `ActivityResponse` first.
+    """
+    return b'{"data":%s}' % activity_rows_adapter.dump_json(list(activities))
+
+
 @activity_router.get(
     "/public", response_model=ActivityListResponse, tags=["Activity Retrieval"]
 )
 async def get_public_activities(
     activity_repository: ActivityRepositoryDep,
+    if_none_match: Annotated[str | None, Header()] = None,
 ):
     """
     Retrieve all public financial activities.
@@ -627,35 +678,22 @@ async def get_public_activities(
 
     Returns:
         ActivityListResponse: A sorted list of all public activities with their complete details.
+        Responds with 304 Not Modified when `If-None-Match` matches the catalog's ETag.
     """
 
-    activities = await activity_repository.get_public_activities()
+    count, last_updated_at = await activity_repository.get_public_activities_version()
+    etag = make_etag(count, last_updated_at)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
 
-    # Sort activities by level: beginner, intermediate, advanced, then by created_at (newest first)
-    level_order = {"beginner": 1, "intermediate": 2, "advanced": 3}
-    sorted_activities = sorted(
-        activities,
-        key=lambda a: (level_order.get(a.level.lower(), 99), -a.created_at.timestamp()),
-    )
+    activities = [
+        activity async for activity in activity_repository.get_public_activities()
+    ]
 
-    return ActivityListResponse(
-        data=[
-            ActivityResponse(
-                id=activity.id,
-                user_id=activity.user_id,
-                title=activity.title,
-                description=activity.description,
-                overall_objective=activity.overall_objective,
-                background=activity.background,
-                steps=activity.steps,
-                glossary=activity.glossary,
-                alternative_methods=activity.alternative_methods,
-                level=activity.level,
-                created_at=activity.created_at,
-                updated_at=activity.updated_at,
-            )
-            for activity in sorted_activities
-        ]
+    return Response(
+        activity_list_json(activities),
+        media_type="application/json",
+        headers={"ETag": etag},
     )
 
 
@@ -682,32 +720,7 @@ async def get_user_activities(
 
     activities = await activity_repository.get_user_activities(user_id)
 
-    # Sort activities by level: beginner, intermediate, advanced, then by created_at (newest first)
-    level_order = {"beginner": 1, "intermediate": 2, "advanced": 3}
-    sorted_activities = sorted(
-        activities,
-        key=lambda a: (level_order.get(a.level.lower(), 99), -a.created_at.timestamp()),
-    )
-
-    return ActivityListResponse(
-        data=[
-            ActivityResponse(
-                id=activity.id,
-                user_id=activity.user_id,
-                title=activity.title,
-                description=activity.description,
-                overall_objective=activity.overall_objective,
-                background=activity.background,
-                steps=activity.steps,
-                glossary=activity.glossary,
-                alternative_methods=activity.alternative_methods,
-                level=activity.level,
-                created_at=activity.created_at,
-                updated_at=activity.updated_at,
-            )
-            for activity in sorted_activities
-        ]
-    )
+    return Response(activity_list_json(activities), media_type="application/json")
 
 
 @activity_router.get(
@@ -716,6 +729,7 @@ async def get_user_activities(
 async def get_activity(
     activity_id: UUID,
     activity_repository: ActivityRepositoryDep,
+    if_none_match: Annotated[str | None, Header()] = None,
 ):
     """
     Retrieve a specific financial activity by its ID.
@@ -728,26 +742,18 @@ async def get_activity(
 
     Returns:
         ActivityResponse: The complete details of the requested activity.
+        Responds with 304 Not Modified when `If-None-Match` matches the activity's ETag.
 
     Raises:
         HTTPException: 404 error if the activity with the specified ID is not found.
     """
 
-    activity = await activity_repository.get_activity(str(activity_id))
+    activity = await activity_repository.get_activity(activity_id)
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
 
-    return ActivityResponse(
-        id=activity.id,
-        user_id=activity.user_id,
-        title=activity.title,
-        description=activity.description,
-        overall_objective=activity.overall_objective,
-        background=activity.background,
-        steps=activity.steps,
-        glossary=activity.glossary,
-        alternative_methods=activity.alternative_methods,
-        level=activity.level,
-        created_at=activity.created_at,
-        updated_at=activity.updated_at,
-    )
+    etag = make_etag(activity.id, activity.updated_at)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return activity_json_response(activity, headers={"ETag": etag})
@@ -14,6 +14,11 @@ class Settings(BaseSettings):
     DATABASE_NAME: str
     DATABASE_POOL_SIZE: int = 50
     DATABASE_POOL_MAX_OVERFLOW: int = 50
+    DATABASE_POOL_RECYCLE: int = 1800
+    # With PgBouncer, `jit` can't be sent at connect time; disable it on the role.
+    DATABASE_USE_PGBOUNCER: bool = False
+    CHECKPOINTER_POOL_MIN_SIZE: int = 5
+    CHECKPOINTER_POOL_SIZE: int = 20
 
     @computed_field  # type: ignore[misc]
     @property
@@ -45,6 +50,11 @@ class Settings(BaseSettings):
 
     INVERSO_API_KEY: str | None = None
 
+    LLM_LATENCY_MODE: bool = False
+    CHAT_HISTORY_MAX_MESSAGES: int = 20
+    CHAT_FAST_MODEL: str = "gpt-4.1-mini"
+    CHAT_FAST_MODEL_MAX_CHARS: int = 200
+
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
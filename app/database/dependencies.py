@@ -16,8 +16,8 @@ async def get_db_session() -> AsyncGenerator[AsyncSession]:
 SessionDep = Annotated[AsyncSession, Depends(get_db_session)]
 
 
-async def get_checkpointer(request: Request) -> AsyncGenerator[AsyncPostgresSaver]:
-    yield cast(AsyncPostgresSaver, request.state.checkpointer)
+async def get_checkpointer(request: Request) -> AsyncPostgresSaver:
+    return cast(AsyncPostgresSaver, request.state.checkpointer)
 
 
 CheckpointerDep = Annotated[AsyncPostgresSaver, Depends(get_checkpointer)]
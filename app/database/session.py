@@ -1,11 +1,43 @@
+import uuid
+from typing import Any
+
+import orjson
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from app.config import settings
 
+
+def json_serializer(value: object) -> str:
+    # No `default`: values orjson can't encode must fail instead of being stored as
+    # their `str()`.
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+connect_args: dict[str, Any]
+if settings.DATABASE_USE_PGBOUNCER:
+    # Transaction-pooling proxies can't keep server-side prepared statements around.
+    # PgBouncer also rejects unknown startup parameters such as `jit`, so set
+    # `ALTER ROLE ... SET jit = off` on the database instead.
+    connect_args = {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        # asyncpg still prepares each statement; unique names keep them from
+        # colliding on server connections shared between clients.
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+else:
+    # JIT compilation only pays off for long analytical queries, not our short lookups.
+    connect_args = {"server_settings": {"jit": "off"}}
+
 engine = create_async_engine(
     settings.DATABASE_URI_ASYNCPG.encoded_string(),
     pool_size=settings.DATABASE_POOL_SIZE,
     max_overflow=settings.DATABASE_POOL_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=settings.DATABASE_POOL_RECYCLE,
+    connect_args=connect_args,
+    json_serializer=json_serializer,
+    json_deserializer=orjson.loads,
 )
 
 SessionLocal = async_sessionmaker(engine)
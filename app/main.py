@@ -1,51 +1,64 @@
+import asyncio
 from contextlib import asynccontextmanager
-from typing import Annotated
+from functools import lru_cache
+from typing import cast
 
-from fastapi import Depends, FastAPI, Header, HTTPException, Request, status
+from fastapi import FastAPI, Response, Security
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import HTMLResponse
 from scalar_fastapi import get_scalar_api_reference  # type: ignore
 from sqlalchemy import text
 
+from app.activity.llm import close_http_async_client
 from app.activity.router import activity_router as activity_router
 from app.activity.router import chat_activity_router
 from app.config import settings
 from app.database.models import initialize_database
-from app.database.session import SessionLocal
+from app.database.session import engine
+from app.middleware import InversoAPIKeyMiddleware, inverso_api_key_header
 from app.onboarding.router import router as onboarding_router
+from app.serialization import dumps
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):  # noqa: ARG001
     from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
 
     from app.activity.agent import get_graph as get_activity_graph
     from app.onboarding.agent import get_graph as get_onboarding_graph
 
-    await initialize_database()
-    async with AsyncPostgresSaver.from_conn_string(
-        settings.DATABASE_URI_PSYCOPG.encoded_string()
-    ) as checkpointer:
-        await checkpointer.setup()
+    # A pool instead of a single connection, so concurrent threads don't queue up
+    # behind one another's checkpoint reads and writes. psycopg prepares statements
+    # from `prepare_threshold` uses on; `None` turns that off, as PgBouncer needs.
+    prepare_threshold = None if settings.DATABASE_USE_PGBOUNCER else 0
+    async with AsyncConnectionPool(
+        conninfo=settings.DATABASE_URI_PSYCOPG.encoded_string(),
+        min_size=settings.CHECKPOINTER_POOL_MIN_SIZE,
+        max_size=settings.CHECKPOINTER_POOL_SIZE,
+        max_lifetime=settings.DATABASE_POOL_RECYCLE,
+        kwargs={
+            "autocommit": True,
+            "prepare_threshold": prepare_threshold,
+            "row_factory": dict_row,
+        },
+        open=False,
+    ) as pool:
+        checkpointer = AsyncPostgresSaver(pool)  # type: ignore[arg-type]
+        # The app tables and the checkpointer tables are independent, so set them up
+        # concurrently.
+        await asyncio.gather(initialize_database(), checkpointer.setup())
         yield {
             "checkpointer": checkpointer,
             "onboarding_agent": get_onboarding_graph(checkpointer=checkpointer),
             "activity_agent": get_activity_graph(checkpointer=checkpointer),
         }
 
+    await close_http_async_client()
 
-async def validate_inverso_api_key(
-    request: Request,
-    x_inverso_api_key: Annotated[str | None, Header()] = None,
-):
-    if request.url.path == "/scalar":
-        return
-
-    if x_inverso_api_key != settings.INVERSO_API_KEY:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid x-inverso-api-key header",
-        )
 
+OPENAPI_URL = "/openapi.json"
 
 app = FastAPI(
     title="InversoAI API",
@@ -82,9 +95,11 @@ connect directly to users' real-life situations.
 All API endpoints require authentication using the `x-inverso-api-key` header.
     """,
     lifespan=lifespan,
-    dependencies=[Depends(validate_inverso_api_key)],
+    dependencies=[Security(inverso_api_key_header)],
     redoc_url=None,
     docs_url=None,
+    # Served below from a cached encoding instead of FastAPI's per-request dump.
+    openapi_url=None,
     version="1.0.0",
 )
 
@@ -97,6 +112,11 @@ origins = [
     "*",
 ]
 
+# Added before CORS so it runs inside it and preflight requests never need the key.
+app.add_middleware(
+    InversoAPIKeyMiddleware,
+    exempt_paths=frozenset({"/scalar", OPENAPI_URL}),
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -122,11 +142,35 @@ async def health():
         HTTPException: If the database connection fails, an exception will be raised,
                       resulting in a non-200 status code response.
     """
-    async with SessionLocal() as session:
-        await session.execute(text("SELECT 1"))
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
     return {"status": "ok"}
 
 
+@lru_cache(maxsize=1)
+def get_openapi_json() -> bytes:
+    """Encode the OpenAPI schema once; routes don't change after startup."""
+    return dumps(app.openapi())
+
+
+@app.get(OPENAPI_URL, include_in_schema=False)
+async def openapi_json():
+    return Response(get_openapi_json(), media_type="application/json")
+
+
+@lru_cache(maxsize=1)
+def get_scalar_html(openapi_url: str) -> bytes:
+    """Render the Scalar page once; it only depends on the schema URL and title."""
+    # scalar_fastapi is untyped.
+    return cast(
+        bytes,
+        get_scalar_api_reference(
+            openapi_url=openapi_url,
+            title="InversoAI API - Personalized Financial Education Platform",
+        ).body,
+    )
+
+
 @app.get(
     "/scalar",
     include_in_schema=False,
@@ -143,12 +187,9 @@ async def scalar_html():
     Returns:
         HTML content: The Scalar API reference UI with the OpenAPI specification loaded.
     """
-    if app.openapi_url is None:
-        return
-
-    return get_scalar_api_reference(
-        openapi_url=app.openapi_url,
-        title="InversoAI API - Personalized Financial Education Platform",
+    return HTMLResponse(
+        get_scalar_html(OPENAPI_URL),
+        headers={"Cache-Control": "public, max-age=3600"},
     )
 
 
@@ -0,0 +1,50 @@
+import hmac
+
+from fastapi.security import APIKeyHeader
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.serialization import ORJSONResponse
+
+INVERSO_API_KEY_BYTES = (
+    settings.INVERSO_API_KEY.encode() if settings.INVERSO_API_KEY else None
+)
+
+# The middleware does the checking; this only declares the header as a security
+# scheme in the OpenAPI schema, so the docs show it and send it.
+inverso_api_key_header = APIKeyHeader(name="x-inverso-api-key", auto_error=False)
+
+
+class InversoAPIKeyMiddleware:
+    """
+    Reject requests without a valid `x-inverso-api-key` header before routing.
+
+    Written as plain ASGI rather than `BaseHTTPMiddleware`, so streaming responses
+    pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, exempt_paths: frozenset[str] = frozenset()):
+        self.app = app
+        self.exempt_paths = exempt_paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or INVERSO_API_KEY_BYTES is None
+            or scope["path"] in self.exempt_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        api_key = Headers(scope=scope).get("x-inverso-api-key")
+        if api_key is None or not hmac.compare_digest(
+            api_key.encode(), INVERSO_API_KEY_BYTES
+        ):
+            response = ORJSONResponse(
+                {"detail": "Invalid x-inverso-api-key header"}, status_code=401
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
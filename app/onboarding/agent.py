@@ -1,17 +1,20 @@
 import datetime
-from typing import Annotated, Literal
+from collections.abc import Callable
+from functools import cache, lru_cache
+from operator import attrgetter
+from typing import Annotated, Any, Literal
 
 import trustcall
-from langchain_core.callbacks.manager import (
-    adispatch_custom_event,
-)
 from langchain_core.messages import BaseMessage
-from langchain_core.runnables import RunnableConfig
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import Runnable, RunnableConfig
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+from langgraph.config import get_stream_writer
 from langgraph.graph import END, StateGraph, add_messages
 from langgraph.graph.state import CompiledStateGraph
 from pydantic import BaseModel, Field
+from trustcall import ExtractionOutputs
+
+from app.activity.llm import clears_with_http_client, get_chat_llm
 
 Messages = Annotated[list[BaseMessage], add_messages]
 
@@ -29,13 +32,7 @@ class Configuration(BaseModel):
         cls, config: RunnableConfig | None = None
     ) -> "Configuration":
         """Create a Configuration instance from a RunnableConfig."""
-        configurable = (
-            config["configurable"] if config and "configurable" in config else {}
-        )
-
-        values = {key: values for key, values in configurable.items() if key}
-
-        return cls(**values)
+        return cls.model_validate(config.get("configurable", {}) if config else {})
 
 
 class PersonalContext(BaseModel):
@@ -62,20 +59,37 @@ class PersonalContext(BaseModel):
     )
 
 
+@cache
+def get_field_probes(
+    model_type: type[BaseModel], prefix: str = ""
+) -> tuple[tuple[str, Callable[[object], Any], bool], ...]:
+    """
+    Precompute `(dotted name, getter, empty list counts as missing)` for each field.
+
+    Built once per model type, so checking for missing fields doesn't walk the
+    field metadata again on every turn.
+    """
+    return tuple(
+        (
+            f"{prefix}.{field_name}" if prefix else field_name,
+            attrgetter(field_name),
+            field.default_factory is not None or field.default is not None,
+        )
+        for field_name, field in model_type.model_fields.items()
+    )
+
+
 def get_missing_fields(model: BaseModel, prefix: str = "") -> list[str]:
     missing: list[str] = []
-    for field_name, field in model.__fields__.items():
-        value = getattr(model, field_name)
-        full_name = f"{prefix}.{field_name}" if prefix else field_name
+    for full_name, get_value, has_default in get_field_probes(type(model), prefix):
+        value = get_value(model)
 
         # Si es un modelo anidado, revisa recursivamente
         if isinstance(value, BaseModel):
             missing += get_missing_fields(value, prefix=full_name)
         # Si es una lista, considera faltante si está vacía y no es opcional
         elif isinstance(value, list):
-            if not value and (
-                field.default_factory is not None or field.default is not None
-            ):
+            if not value and has_default:
                 # Solo marca como faltante si la lista está vacía y no es opcional
                 missing.append(full_name)
         # Si es string, considera faltante si es None o vacío
@@ -88,16 +102,6 @@ def get_missing_fields(model: BaseModel, prefix: str = "") -> list[str]:
     return missing
 
 
-def get_nested_attr(obj: object, attr_path: str):
-    """Get nested attribute from an object using dot notation."""
-    attrs = attr_path.split(".")
-    for attr in attrs:
-        if obj is None:
-            return None
-        obj = getattr(obj, attr, None)
-    return obj
-
-
 class OnboardingData(BaseModel):
     """All relevant information collected during the onboarding process."""
 
@@ -220,29 +224,25 @@ class OnboardingData(BaseModel):
     )
 
 
+# Shared empty onboarding data; it is replaced, never mutated, as fields are collected.
+default_onboarding_data = OnboardingData(
+    profession=None,
+    age_range=None,
+    life_stage=None,
+    financial_goals=[],
+    financial_interests=[],
+    financial_concerns=[],
+    financial_knowledge_level="Unknown",
+    previous_experience=[],
+    personal_context=PersonalContext(hobbies=[], family_status=None),
+    onboarding_completed=False,
+)
+
+
 def latest_onboarding_data(
     onboarding_data: OnboardingData | None, new_onboarding_data: OnboardingData | None
 ) -> OnboardingData:
-    match onboarding_data, new_onboarding_data:
-        case None, None:
-            return OnboardingData(
-                profession=None,
-                age_range=None,
-                life_stage=None,
-                financial_goals=[],
-                financial_interests=[],
-                financial_concerns=[],
-                financial_knowledge_level="Unknown",
-                previous_experience=[],
-                personal_context=PersonalContext(hobbies=[], family_status=None),
-                onboarding_completed=False,
-            )
-        case None, new_onboarding_data:
-            return new_onboarding_data
-        case onboarding_data, None:
-            return onboarding_data
-        case onboarding_data, new_onboarding_data:
-            return new_onboarding_data
+    return new_onboarding_data or onboarding_data or default_onboarding_data
 
 
 class State(BaseModel):
@@ -253,42 +253,7 @@ class State(BaseModel):
     )
 
 
-async def chat_onboarding(state: State, config: RunnableConfig) -> BotResponse:
-    configuration = Configuration.from_runnable_config(config)
-
-    messages = state.messages
-
-    if state.onboarding_data is None:
-        state.onboarding_data = OnboardingData(
-            profession=None,
-            age_range=None,
-            life_stage=None,
-            financial_goals=[],
-            financial_interests=[],
-            financial_concerns=[],
-            financial_knowledge_level="Unknown",
-            previous_experience=[],
-            personal_context=PersonalContext(hobbies=[], family_status=None),
-            onboarding_completed=False,
-        )
-
-    llm = ChatOpenAI(temperature=0.0, model="gpt-4.1")
-
-    collected_information = "\n".join(
-        f"{field}: {getattr(state.onboarding_data, field)}"
-        for field in state.onboarding_data.__fields__
-        if getattr(state.onboarding_data, field)
-        and field not in get_missing_fields(state.onboarding_data)
-    )
-
-    missing_information = "\n".join(
-        # f"{field}: {getattr(state.onboarding_data, field)}\nDescripción: {OnboardingData.__fields__[field].description}"
-        f"{field}: {get_nested_attr(state.onboarding_data, field)}\nDescripción: {OnboardingData.model_fields[field.split('.')[0]].description}"
-        for field in get_missing_fields(state.onboarding_data)
-    )
-
-    if missing_information:
-        system_prompt = """\
+ONBOARDING_SYSTEM_PROMPT = """\
     You are InversoAI, a friendly and empathetic financial assistant. 
     Your main goal is to help {user_full_name} understand personal finance concepts 
     in a simple and relatable way.
@@ -348,20 +313,7 @@ async def chat_onboarding(state: State, config: RunnableConfig) -> BotResponse:
     Today is {current_date}.
     """
 
-        system_message = system_prompt.format(
-            user_full_name=configuration.user_full_name,
-            current_date=configuration.current_date,
-            collected_information=collected_information,
-            missing_information="\n".join(get_missing_fields(state.onboarding_data)),
-        )
-
-        response = await llm.ainvoke([("system", system_message)] + messages)
-
-        return {
-            "messages": [response],
-        }
-    else:
-        system_prompt = """\
+ONBOARDING_COMPLETED_SYSTEM_PROMPT = """\
 You are InversoAI, a friendly and empathetic financial assistant.
 Your main goal is to help {user_full_name} understand personal finance concepts
 in a simple and relatable way.
@@ -374,9 +326,33 @@ Tell them that you are exited to help them achieve their financial goals and tha
 
 Close telling them that you are going to create customized learning activities for them and that you hope to see them soon."""
 
-        system_message = system_prompt.format(
+
+async def chat_onboarding(state: State, config: RunnableConfig) -> BotResponse:
+    configuration = Configuration.from_runnable_config(config)
+
+    messages = state.messages
+
+    if state.onboarding_data is None:
+        state.onboarding_data = default_onboarding_data
+
+    llm = get_chat_llm(model="gpt-4.1", temperature=0.0)
+
+    missing_fields = get_missing_fields(state.onboarding_data)
+    missing_field_names = frozenset(missing_fields)
+
+    collected_information = "\n".join(
+        f"{field}: {value}"
+        for field in OnboardingData.model_fields
+        if field not in missing_field_names
+        and (value := getattr(state.onboarding_data, field))
+    )
+
+    if missing_fields:
+        system_message = ONBOARDING_SYSTEM_PROMPT.format(
             user_full_name=configuration.user_full_name,
             current_date=configuration.current_date,
+            collected_information=collected_information,
+            missing_information="\n".join(missing_fields),
         )
 
         response = await llm.ainvoke([("system", system_message)] + messages)
@@ -384,38 +360,42 @@ Close telling them that you are going to create customized learning activities f
         return {
             "messages": [response],
         }
+    else:
+        system_message = ONBOARDING_COMPLETED_SYSTEM_PROMPT.format(
+            user_full_name=configuration.user_full_name,
+            current_date=configuration.current_date,
+        )
 
+        response = await llm.ainvoke([("system", system_message)] + messages)
 
-async def collect_onboarding_data(state: State, config: RunnableConfig):
-    if state.onboarding_data is None:
-        state.onboarding_data = OnboardingData(
-            profession=None,
-            age_range=None,
-            life_stage=None,
-            financial_goals=[],
-            financial_interests=[],
-            financial_concerns=[],
-            financial_knowledge_level="Unknown",
-            previous_experience=[],
-            personal_context=PersonalContext(hobbies=[], family_status=None),
-            onboarding_completed=False,
-        )
+        return {
+            "messages": [response],
+        }
 
-    llm = ChatOpenAI(
-        temperature=0.0,
+
+@clears_with_http_client
+@lru_cache(maxsize=1)
+def get_onboarding_extractor() -> Runnable[Any, ExtractionOutputs]:
+    """Build the onboarding data extractor once; it compiles the tool schema."""
+    llm = get_chat_llm(
         # model="gpt-4.1",
         # model="gpt-4o-mini-2024-07-18",
         model="gpt-4.1-mini-2025-04-14",
         # model="gpt-4.1-nano-2025-04-14",
+        temperature=0.0,
     )
-
-    extractor = trustcall.create_extractor(
+    return trustcall.create_extractor(
         llm=llm,
         tools=[OnboardingData],
         tool_choice="OnboardingData",
     )
 
-    response = await extractor.ainvoke(
+
+async def collect_onboarding_data(state: State, config: RunnableConfig):
+    if state.onboarding_data is None:
+        state.onboarding_data = default_onboarding_data
+
+    response = await get_onboarding_extractor().ainvoke(
         {
             "messages": state.messages,
             "existing": {"OnboardingData": state.onboarding_data.model_dump()},
@@ -428,10 +408,9 @@ async def collect_onboarding_data(state: State, config: RunnableConfig):
 
     onboarding_completed = getattr(final_onboarding_data, "onboarding_completed", False)
     if onboarding_completed:
-        await adispatch_custom_event(
-            "onboarding_completed",
-            final_onboarding_data.model_dump(),
-        )
+        # Sent on the graph's "custom" stream; the router frames it as an
+        # `onboarding_completed` event.
+        get_stream_writer()(final_onboarding_data.model_dump())
 
     return {"onboarding_data": final_onboarding_data}
 
@@ -448,5 +427,7 @@ onboarding_agent_builder.add_edge("collect_onboarding_data", "chat_onboarding")
 onboarding_agent_builder.add_edge("chat_onboarding", END)
 
 
+@lru_cache(maxsize=4)
 def get_graph(checkpointer: AsyncPostgresSaver | None = None) -> CompiledStateGraph:
+    """Compile the graph once per checkpointer."""
     return onboarding_agent_builder.compile(checkpointer=checkpointer)
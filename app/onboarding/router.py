@@ -1,14 +1,21 @@
 from typing import Annotated, Any, Literal
 
-import orjson
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Response
 from fastapi.responses import StreamingResponse
 from langchain_core.messages import AIMessageChunk, HumanMessage
-from langchain_core.runnables.schema import EventData
+from langchain_core.runnables import RunnableConfig
+from langgraph.types import StreamMode
 from pydantic import BaseModel, Field
 
 from app.onboarding.agent import OnboardingData
 from app.onboarding.dependencies import OnboaringAgentDep
+from app.serialization import ORJSONResponse, ResponseMetadataEncoder, dumps
+from app.streaming import (
+    AI_MESSAGE_CHUNK_EVENT,
+    SSE_HEADERS,
+    coalesce_sse_frames,
+    format_sse,
+)
 
 
 class ChatOnboardingRequest(BaseModel):
@@ -34,20 +41,47 @@ class ChatOnboardingStateRequest(BaseModel):
     )
 
 
-def format_sse(data: str, event: str | None = None) -> bytes:
-    """Format a message as an SSE event."""
-    msg = ""
-    if event:
-        msg += f"event: {event}\n"
-    for line in data.rstrip().splitlines():
-        msg += f"data: {line}\n"
-    msg += "\n"
-    return msg.encode("utf-8")
+ONBOARDING_COMPLETED_EVENT = b"onboarding_completed"
+
+
+def handle_onboarding_completed(data: Any) -> bytes | None:
+    return format_sse(dumps(data), event=ONBOARDING_COMPLETED_EVENT)
+
+
+def handle_chat_onboarding_stream(
+    data: Any, encode_metadata: ResponseMetadataEncoder
+) -> bytes | None:
+    message_chunk, metadata = data
+
+    if metadata.get("langgraph_node") != "chat_onboarding":
+        return None
+
+    if not isinstance(message_chunk, AIMessageChunk):
+        return None
+
+    return format_sse(
+        dumps(
+            {
+                "id": message_chunk.id,
+                "content": message_chunk.content,
+                "response_metadata": encode_metadata(message_chunk.response_metadata),
+            },
+        ),
+        event=AI_MESSAGE_CHUNK_EVENT,
+    )
+
+
+# The graph only writes onboarding data to "custom".
+STREAM_MODES: list[StreamMode] = ["custom", "messages"]
+
+
+CHAT_ONBOARDING_BASE_CONFIG: RunnableConfig = {"run_name": "chat_onboarding"}
 
 
 router = APIRouter(
     prefix="/chat/onboarding",
     tags=["Onboarding Conversation"],
+    default_response_class=ORJSONResponse,
 )
 
 
@@ -71,68 +105,35 @@ async def chat_onboarding(
     """
     human_message = HumanMessage(content=request.message)
 
+    # Keep this an async generator; Starlette iterates sync ones in a threadpool.
     async def stream_response():
-        async for event in agent.astream_events(
-            stream_mode=["custom", "messages"],
-            version="v2",
+        # Per stream, so concurrent streams don't evict each other's metadata.
+        encode_metadata = ResponseMetadataEncoder()
+        async for mode, data in agent.astream(
+            stream_mode=STREAM_MODES,
             config={
+                **CHAT_ONBOARDING_BASE_CONFIG,
                 "configurable": {
                     "thread_id": request.thread_id,
                     "user_full_name": request.user_full_name,
                 },
-                "run_name": "chat_onboarding",
             },
             input={
                 "messages": [human_message],
             },
         ):
-            if (
-                event["event"] == "on_custom_event"
-                and event["name"] == "onboarding_completed"
-            ):
-                data = event["data"]
-                yield format_sse(
-                    orjson.dumps(
-                        data,
-                    ).decode("utf-8"),
-                    event="onboarding_completed",
-                )
-
-            if (
-                event["event"] == "on_chain_stream"
-                and event["name"] == "chat_onboarding"
-            ):
-                data: EventData | Any = event["data"]
-                chunk = data["chunk"]
-
-                if not isinstance(chunk, tuple):
-                    continue
-
-                _, message_chunk = chunk
-
-                if not isinstance(message_chunk, tuple):
-                    continue
-
-                message_chunk, metadata = message_chunk
-
-                if not isinstance(message_chunk, AIMessageChunk):
-                    continue
-
-                langgraph_node = metadata.get("langgraph_node", None)
-
-                if langgraph_node == "chat_onboarding":
-                    yield format_sse(
-                        orjson.dumps(
-                            {
-                                "id": message_chunk.id,
-                                "content": message_chunk.content,
-                                "response_metadata": message_chunk.response_metadata,
-                            },
-                        ).decode("utf-8"),
-                        event="ai_message_chunk",
-                    )
-
-    return StreamingResponse(stream_response(), media_type="text/event-stream")
+            if mode == "messages":
+                frame = handle_chat_onboarding_stream(data, encode_metadata)
+            else:
+                frame = handle_onboarding_completed(data)
+            if frame is not None:
+                yield frame
+
+    return StreamingResponse(
+        coalesce_sse_frames(stream_response()),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
 
 class HumanMessageData(BaseModel):
@@ -149,6 +150,11 @@ class AIMessageData(BaseModel):
 
 Message = Annotated[HumanMessageData | AIMessageData, Field(discriminator="type")]
 
+MESSAGE_DATA_TYPES: dict[str, type[HumanMessageData | AIMessageData]] = {
+    "human": HumanMessageData,
+    "ai": AIMessageData,
+}
+
 
 class GetStateResponse(BaseModel):
     messages: list[Message]
@@ -174,16 +180,14 @@ async def get_state(
     config = {"configurable": {"thread_id": request.thread_id}}
     state = await agent.aget_state(config=config)
     messages = state.values["messages"]
-    onboarding_data = state.values["onboarding_data"]
-    return {
-        "messages": [
-            {
-                "id": message.id,
-                "type": message.type,
-                "content": message.content,
-            }
+    # The checkpointer restores the state's own validated model, so pass it
+    # through instead of dumping and validating it again.
+    response = GetStateResponse.model_construct(
+        messages=[
+            MESSAGE_DATA_TYPES[message.type](id=message.id, content=message.content)
             for message in messages
-            if message.type in ["human", "ai"]
+            if message.type in MESSAGE_DATA_TYPES
         ],
-        "onboarding_data": onboarding_data.model_dump(),
-    }
+        onboarding_data=state.values["onboarding_data"],
+    )
+    return Response(response.model_dump_json(), media_type="application/json")
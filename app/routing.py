@@ -0,0 +1,33 @@
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from pydantic_core import from_json
+
+
+class JiterJSONRoute(APIRoute):
+    """
+    Route that decodes JSON request bodies with pydantic-core's jiter parser.
+
+    FastAPI reads the body through `Request.json()`, which uses the stdlib `json`
+    module. Pre-populating Starlette's cached `_json` attribute swaps in the
+    faster parser without changing validation or the OpenAPI schema.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "")
+            if content_type.startswith("application/json"):
+                body = await request.body()
+                if body:
+                    try:
+                        request._json = from_json(body)
+                    except ValueError:
+                        # Leave invalid bodies to FastAPI so it reports the usual error.
+                        pass
+            return await route_handler(request)
+
+        return custom_route_handler
@@ -0,0 +1,53 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+
+
+def dumps(value: Any) -> bytes:
+    """
+    `orjson.dumps` with the app-wide options.
+
+    UUIDs and datetimes are handled natively; anything orjson doesn't know (e.g. odd
+    values in LLM response metadata) falls back to `str` instead of raising.
+    """
+    return orjson.dumps(value, option=ORJSON_OPTIONS, default=str)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with the shared `dumps`."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+EMPTY_METADATA_FRAGMENT = orjson.Fragment(b"{}")
+
+
+class ResponseMetadataEncoder:
+    """
+    Encode chunk metadata for one stream, reusing the bytes when it is unchanged.
+
+    Most chunks carry empty metadata, and the rest often share one object across a run.
+    Create one per stream so concurrent streams don't evict each other's entry. The
+    last object is kept referenced, so the identity check cannot match a reused id.
+    """
+
+    def __init__(self) -> None:
+        self._last: tuple[object, orjson.Fragment] = (None, EMPTY_METADATA_FRAGMENT)
+
+    def __call__(self, response_metadata: dict[str, Any]) -> orjson.Fragment:
+        if not response_metadata:
+            return EMPTY_METADATA_FRAGMENT
+
+        last_object, last_fragment = self._last
+        if response_metadata is last_object:
+            return last_fragment
+
+        fragment = orjson.Fragment(dumps(response_metadata))
+        self._last = (response_metadata, fragment)
+        return fragment
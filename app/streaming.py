@@ -0,0 +1,82 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+AI_MESSAGE_CHUNK_EVENT = b"ai_message_chunk"
+
+# Keep proxies (e.g. nginx) from caching or buffering the stream so tokens flush immediately.
+SSE_HEADERS = {"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"}
+
+
+def format_sse(data: bytes, event: bytes | None = None) -> bytes:
+    """
+    Format a message as an SSE event.
+
+    `orjson.dumps` output never contains newlines, so the split into one `data:`
+    line per line of payload only runs for other multi-line data.
+    """
+    if b"\n" in data:
+        data = data.replace(b"\n", b"\ndata: ")
+    if event:
+        return b"event: %s\ndata: %s\n\n" % (event, data)
+    return b"data: %s\n\n" % data
+
+
+AI_MESSAGE_CHUNK_FRAME_PREFIX = b"event: " + AI_MESSAGE_CHUNK_EVENT + b"\n"
+
+
+async def coalesce_sse_frames(
+    frames: AsyncIterator[bytes],
+    max_delay: float = 0.005,
+    max_bytes: int = 8192,
+) -> AsyncIterator[bytes]:
+    """
+    Merge consecutive message-chunk frames into larger writes.
+
+    Frames are buffered for up to `max_delay` seconds or `max_bytes` bytes.
+    Any other event (e.g. progress or onboarding completion) flushes the buffer right away.
+    The bounded queue applies backpressure to the producer.
+    """
+    queue: asyncio.Queue[bytes | BaseException | None] = asyncio.Queue(maxsize=256)
+
+    async def produce() -> None:
+        try:
+            async for frame in frames:
+                await queue.put(frame)
+                # `put` only suspends when the queue is full, and a fast upstream
+                # may not suspend either; yield so other streams get a turn.
+                await asyncio.sleep(0)
+        except Exception as e:
+            await queue.put(e)
+        else:
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    buffer = bytearray()
+    try:
+        while True:
+            if buffer:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max_delay)
+                except TimeoutError:
+                    yield bytes(buffer)
+                    buffer.clear()
+                    continue
+            else:
+                item = await queue.get()
+
+            if item is None:
+                break
+            if isinstance(item, BaseException):
+                raise item
+
+            buffer += item
+            if len(buffer) >= max_bytes or not item.startswith(
+                AI_MESSAGE_CHUNK_FRAME_PREFIX
+            ):
+                yield bytes(buffer)
+                buffer.clear()
+
+        if buffer:
+            yield bytes(buffer)
+    finally:
+        producer.cancel()
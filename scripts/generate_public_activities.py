@@ -198,36 +198,6 @@ data: dict[ActivityLevel, list[ActivityData]] = {
 }
 
 
-async def create(
-    level: ActivityLevel,
-    activity: ActivityData,
-):
-    generated_activity = await create_activity_from_concepts(
-        level=level,
-        concepts=activity["concepts"],
-        guided_description=activity["guided_description"],
-        user_context=None,
-    )
-
-    async with SessionLocal() as session:
-        repository = ActivityRepository(session)
-        await repository.create_public_activity(
-            Activity(
-                user_id=None,
-                title=generated_activity.title,
-                description=generated_activity.description,
-                overall_objective=generated_activity.overall_objective,
-                background=generated_activity.background.model_dump(),
-                steps=[step.model_dump() for step in generated_activity.steps],
-                glossary=generated_activity.glossary,
-                alternative_methods=generated_activity.alternative_methods,
-                level=generated_activity.level,
-            )
-        )
-
-    return None
-
-
 async def generate_activity_rate_limited(
     level: ActivityLevel,
     activity: ActivityData,
@@ -268,8 +238,8 @@ async def main():
             title=activity.title,
             description=activity.description,
             overall_objective=activity.overall_objective,
-            background=activity.background.model_dump(),
-            steps=[step.model_dump() for step in activity.steps],
+            background=dict(activity.background),
+            steps=list(activity.steps),
             glossary=activity.glossary,
             alternative_methods=activity.alternative_methods,
             level=activity.level,
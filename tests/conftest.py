@@ -0,0 +1,13 @@
+import os
+
+# `app.config.settings` is built at import; tests never reach these services.
+for name, value in {
+    "OPENAI_API_KEY": "test",
+    "GROQ_API_KEY": "test",
+    "DATABASE_HOST": "localhost",
+    "DATABASE_PORT": "5432",
+    "DATABASE_USER": "test",
+    "DATABASE_PASSWORD": "test",
+    "DATABASE_NAME": "test",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,27 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.activity.agent import trim_history
+from app.config import settings
+
+
+def test_trim_history_keeps_a_long_current_turn() -> None:
+    tool_calls = [
+        AIMessage(
+            content="",
+            tool_calls=[{"id": f"call_{i}", "name": "lookup", "args": {}}],
+        )
+        if i % 2 == 0
+        else ToolMessage(content="done", tool_call_id=f"call_{i - 1}")
+        for i in range(settings.CHAT_HISTORY_MAX_MESSAGES + 4)
+    ]
+    messages = [
+        HumanMessage(content="earlier"),
+        AIMessage(content="reply"),
+        HumanMessage(content="current"),
+        *tool_calls,
+    ]
+
+    trimmed = trim_history(messages)
+
+    assert trimmed[0].content == "current"
+    assert trimmed == messages[2:]
@@ -0,0 +1,53 @@
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlmodel import Session, col, select
+
+from app.activity.models import Activity, ActivityLevel
+from app.activity.repository import ActivityRepository
+
+
+@compiles(JSONB, "sqlite")
+def compile_jsonb_sqlite(type_: JSONB, compiler: Any, **kw: Any) -> str:
+    # SQLite has no JSONB; its JSON type is close enough for ordering tests.
+    return str(compiler.visit_JSON(type_, **kw))
+
+
+@pytest.fixture
+def session() -> Iterator[Session]:
+    engine = create_engine("sqlite://")
+    Activity.__table__.create(engine)  # type: ignore[attr-defined]
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def make_activity(title: str, level: ActivityLevel) -> Activity:
+    return Activity(
+        user_id=None,
+        title=title,
+        description="",
+        overall_objective="",
+        background={},
+        steps=[],
+        level=level,
+    )
+
+
+def test_catalog_order_sorts_by_level(session: Session) -> None:
+    session.add_all(
+        [
+            make_activity("advanced", ActivityLevel.Advanced),
+            make_activity("beginner", ActivityLevel.Beginner),
+            make_activity("intermediate", ActivityLevel.Intermediate),
+        ]
+    )
+    session.commit()
+
+    query = select(col(Activity.title)).order_by(*ActivityRepository._catalog_order)
+
+    assert session.exec(query).all() == ["beginner", "intermediate", "advanced"]